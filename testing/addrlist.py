@@ -15,15 +15,12 @@ if len(argv) != 3:
 ipv = int(argv[1])
 numaddrs = int(argv[2])
 
-addrs = []
-
-for i in range(numaddrs):
-    if ipv == 4:
-        addrs.append("10.2.{:d}.{:d}".format((i % 251) + 1,
-                                             (i % 241) + 4))
-    else:
-        addrs.append("fdfd:fdfd::{:x}:{:x}".format((i % 65521) + 1,
-                                                   (i % 65519) + 4))
+if ipv == 4:
+    addrs = [f"10.2.{(i % 251) + 1}.{(i % 241) + 4}"
+             for i in range(numaddrs)]
+else:
+    addrs = [f"fdfd:fdfd::{(i % 65521) + 1:x}:{(i % 65519) + 4:x}"
+             for i in range(numaddrs)]
 
 print(",".join(addrs))
 
@@ -8,6 +8,8 @@
 #       number<filename
 #           copy the contents of the file named 'filename' to stdin
 #           that many times
+#           (files are copied byte for byte; CR and CRLF line endings
+#           are passed through, not turned into plain LF)
 #       >string
 #           write the specified line to stdin
 #       number>string
@@ -42,13 +44,22 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import re
 from time import sleep
+from shutil import copyfileobj
 from sys import stderr, stdin, stdout
 
+# "<" and ">" commands, with their optional count prefix, recognized in
+# a single pass over the line; the count is whatever precedes the first
+# "<" or ">", and int() decides if it's valid (it allows spaces & a sign)
+re_count = re.compile("^([^<>]*)([<>])(.*)$")
+
 fails = 0
-while True:
-    # get a line of input
-    line = input()
+for line in stdin:
+    # get a line of input; reading stdin directly, rather than through
+    # input(), avoids flushing stdout and stderr on every line
+    if line[-1:] == '\n':
+        line = line[:-1]
 
     # Recognize commands, comments, and blank lines.  This
     # script does not strip whitespace out of the input.
@@ -65,38 +76,34 @@ while True:
         elif line == "exit":
             # end the script
             exit()
-        elif line.find('<') >= 0:
-            # read file
-            lt = line.find('<')
-            if lt > 0:
-                count = int(line[:lt])
-            else:
-                count = 1
-            while count > 0:
-                count -= 1
-                fp = open(line[(lt+1):], 'r')
-                while True:
-                    get = 32768
-                    buf = fp.read(get)
-                    stdout.write(buf)
-                    if len(buf) < get: break # end of file
-                fp.close()
-            stdout.flush()
-        elif line.find('>') >= 0:
-            # echo line
-            gt = line.find('>')
-            if gt > 0:
-                count = int(line[:gt])
-            else:
-                count = 1
-            while count > 0:
-                count -= 1
-                stdout.write(line[(gt+1):])
-                stdout.write("\n")
-            stdout.flush()
         else:
-            # unrecognized command, let the user know
-            raise Exception("Invalid command input to cmdcat.py")
+            m = re_count.match(line)
+            if m is None:
+                # unrecognized command, let the user know
+                raise Exception("Invalid command input to cmdcat.py")
+            count = int(m.group(1) or 1)
+            if m.group(2) == '<':
+                # read file
+                # Copy in binary, straight to the underlying buffer, so
+                # there's no decoding and re-encoding; and when repeating,
+                # read the file only once.
+                stdout.flush()
+                if count == 1:
+                    with open(m.group(3), 'rb') as fp:
+                        copyfileobj(fp, stdout.buffer, 1 << 20)
+                elif count > 1:
+                    with open(m.group(3), 'rb') as fp:
+                        data = fp.read()
+                    for i in range(count):
+                        stdout.buffer.write(data)
+                stdout.buffer.flush()
+            else:
+                # echo line
+                while count > 0:
+                    count -= 1
+                    stdout.write(m.group(3))
+                    stdout.write("\n")
+                stdout.flush()
         fails = 0
     except Exception as e:
         print(str(e), file=stderr)
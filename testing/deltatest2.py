@@ -38,6 +38,8 @@ from time import sleep
 from sys import stderr, stdin, stdout, argv, exit
 import random as rnd
 from socket import inet_ntop, AF_INET, AF_INET6
+from math import log, log1p
+from functools import lru_cache
 
 ## ## ## read the command line parameters
 
@@ -59,21 +61,25 @@ if addrmax < 1:
 if numops < 1:
     raise Exception("numops must be positive")
 
+# address family & length in bytes, for addrout(); and the first address
+# & how many bits of it are free to change, for mkaddr()
+if ipver == 4:
+    # IPv4: in 10.0.0.0/8
+    addrfam, addrlen = AF_INET, 4
+    addrfirst, hostbits = 0x0a000000, 24
+else:
+    # IPv6: in fd05:aaaa::/32
+    addrfam, addrlen = AF_INET6, 16
+    addrfirst, hostbits = 0xfd05aaaa000000000000000000000000, 96
+
 ## ## ## utility functions
 
+@lru_cache(maxsize= 1 << 20)
 def addrout(a):
     """Output address a, represented in plain numeric form."""
-    parts = []
-    if ipver == 4:
-        # IPv4
-        for i in range(24, -8, -8):
-            parts.append((a >> i) & 255)
-        return(inet_ntop(AF_INET, bytes(parts)))
-    else:
-        # IPv6
-        for i in range(120, -8, -8):
-            parts.append((a >> i) & 255)
-        return(inet_ntop(AF_INET6, bytes(parts)))
+    # memoized: the same addresses keep coming up in one operation after
+    # another
+    return(inet_ntop(addrfam, a.to_bytes(addrlen, "big")))
 
 def addrsout(a_s):
     """Output a list of addresses."""
@@ -83,26 +89,39 @@ def addrsout(a_s):
 def mkbits(l, d):
     """Make a number that's a vector of l bits, of which l*d on average
     will be 1."""
+    # Each bit is 1 with probability d, independently.  Rather than draw a
+    # random number per bit, draw the (geometrically distributed) gaps
+    # between the 1 bits; that's about l*d+1 draws instead of l.
+    if d <= 0: return (0)
+    if d >= 1: return ((1 << l) - 1)
     b = 0
-    for i in range(l):
-        if rnd.uniform(0, 1) < d:
-            b += 1 << i
+    ln1d = log1p(-d)
+    i = int(log(1.0 - rnd.random()) / ln1d)
+    while i < l:
+        b |= 1 << i
+        i += 1 + int(log(1.0 - rnd.random()) / ln1d)
     return (b)
 
+def mklen(m):
+    """Pick a list length in range(m), distributed like the number of
+    times "while n < randrange(m) or n < randrange(m): n += 1" would
+    go around."""
+    # opposite of the loop condition has probability ((n+1)/m)**2; so
+    # one draw per step instead of two; and known before filling the list
+    n = 0
+    while rnd.random() >= ((n + 1) / m) ** 2:
+        n += 1
+    return (n)
+
 def mkaddr(b, d):
     """Make a unicast address based on b, with a modification density d."""
-    if ipver == 4:
-        # IPv4: in 10.0.0.0/8
-        if b is None: b = 0x0a000000
-        return(b ^ mkbits(24, d))
-    else:
-        # IPv6: in fd05:aaaa::/32
-        if b is None: b = 0xfd05aaaa000000000000000000000000
-        return(b ^ mkbits(96, d))
+    if b is None: b = addrfirst
+    return(b ^ mkbits(hostbits, d))
 
 ## ## ## Internal storage of our own copy of the source address list
 
-sources = []
+sources = [] # sorted; may have duplicates, after an absolute set
+source_set = set() # the same addresses, for quick lookup
 
 ## ## ## Go for it
 
@@ -118,69 +137,65 @@ while o < numops:
     #   new 'sources'
     #   'delta' source list
     #   delta type modifier string 'deltype'
-    if o == 0 or rnd.uniform(0, 1) < 0.2:
+    if o == 0 or rnd.random() < 0.2:
         # do an absolute set: -Ea,b,c
         deltype = ""
         delta = []
-        lencrit = lambda: rnd.randrange(0, addrmax)
-        while (len(delta) < lencrit() or
-               len(delta) < lencrit()):
-            if len(delta) and rnd.uniform(0, 1) < 0.4:
+        for i in range(mklen(addrmax)):
+            if len(delta) and rnd.random() < 0.4:
                 a = rnd.choice(delta)
             else:
-                a = mkaddr(a, rnd.uniform(0, modden))
+                a = mkaddr(a, modden * rnd.random())
             delta.append(a)
         sources = sorted(delta)
+        source_set = set(delta)
     elif rnd.choice((False, True)):
         # do a subtractive delta: -E-a,b,c
         deltype = "-"
         delta = []
-        lencrit = lambda: rnd.randrange(0,
-                                        len(sources) + (len(sources) >> 2) + 1)
-        while (len(delta) < lencrit() or
-               len(delta) < lencrit()):
-            if len(sources) and rnd.uniform(0, 1) < 0.6:
-                a = rnd.choice(sources)
+        dlen = mklen(len(sources) + (len(sources) >> 2) + 1)
+        picks = rnd.choices(sources, k= dlen) if len(sources) else None
+        for i in range(dlen):
+            if picks and rnd.random() < 0.6:
+                a = picks[i]
             else:
-                a = mkaddr(a, rnd.uniform(0, modden))
+                a = mkaddr(a, modden * rnd.random())
             delta.append(a)
 
         if len(delta) == 0: continue # can't have -E--
 
         # figure out new sources list
-        dx = set()
-        for s in delta:
-            dx.add(s)
-        sources2 = []
-        for s in sources:
-            if s not in dx:
-                sources2.append(s)
-        sources = sources2
+        dx = set(delta)
+        sources = [s for s in sources if s not in dx]
+        source_set -= dx
     else:
         # do an additive delta: -E+a,b,c
 
         deltype = "+"
         delta = []
-        lencrit = lambda: rnd.randrange(0, addrmax)
-        while (len(delta) < lencrit() or
-               len(delta) < lencrit()):
-            if len(sources) and rnd.uniform(0, 1) < 0.4:
-                a = rnd.choice(sources)
+        dlen = mklen(addrmax)
+        picks = rnd.choices(sources, k= dlen) if len(sources) else None
+        for i in range(dlen):
+            if picks and rnd.random() < 0.4:
+                a = picks[i]
             else:
-                a = mkaddr(a, rnd.uniform(0, modden))
+                a = mkaddr(a, modden * rnd.random())
             delta.append(a)
 
         # figure out new sources list - without duplicates
-        a_s = set()
-        for s in sources:
-            a_s.add(s)
-        for s in delta:
-            a_s.add(s)
+        added = set(delta) - source_set
 
-        if len(a_s) >= addrmax: continue # don't overflow the address list
+        if len(source_set) + len(added) >= addrmax:
+            continue # don't overflow the address list
         if len(delta) == 0: continue # can't have -E+-
 
-        sources = sorted(a_s)
+        source_set |= added
+        if len(sources) + len(added) == len(source_set):
+            # no duplicates to drop, just merge in the new addresses
+            sources.extend(added)
+            sources.sort()
+        else:
+            sources = sorted(source_set)
 
     # emit commands and their expected output
     print("-E" + deltype + addrsout(delta), file= stdout)
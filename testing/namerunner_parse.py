@@ -29,12 +29,17 @@
 import re
 from sys import stdin, stdout
 
-re_expect   = re.compile("^# expected direction: ([-01]*).* name: \"([^\"]*)\"")
-re_usage    = re.compile("^USAGE: ([^ ]*) options[.][.][.]")
-re_rxind    = re.compile(".*-m.*multi.*")
-re_txind    = re.compile(".*-j.*join.*")
-re_abnorm   = re.compile("^#.*exit.*abnormal")
-re_exit     = re.compile("^# exit")
+# All the kinds of interesting line, in one regex so each line only gets
+# matched once.  Alternatives are tried in order, so the first one that fits
+# is the one that counts; the name of its group ("lastgroup") says which.
+re_line     = re.compile(
+    "(?P<expect>^# expected direction: (?P<dir>[-01]*)" +
+    ".* name: \"(?P<name>[^\"]*)\")|" +
+    "(?P<usage>^USAGE: (?P<cmd>[^ ]*) options[.][.][.])|" +
+    "(?P<rxind>.*-m.*multi.*)|" +
+    "(?P<txind>.*-j.*join.*)|" +
+    "(?P<abnorm>^#.*exit.*abnormal)|" +
+    "(?P<exit>^# exit)")
 
 st_dir = 0
 st_name = "?"
@@ -44,47 +49,44 @@ st_tx = False
 cnt_ok = 0
 cnt_prob = 0
 
-lines = stdin.read().split("\n")
-
-for line in lines:
+for line in stdin:
+    if line[-1:] == "\n":
+        line = line[:-1]
     # look for interesting lines
     if len(line) > 0 and line[0] == "#":
         print(line)
-    m = re_expect.match(line)
-    if m:
+    m = re_line.match(line)
+    if not m:
+        continue
+    kind = m.lastgroup
+    if kind == "expect":
         # line tells us what result to expect for the next thing
-        st_dir = int(m.group(1))
-        st_name = m.group(2)
+        st_dir = int(m.group("dir"))
+        st_name = m.group("name")
         if st_name == "!": st_name = "oligocast"
         st_rx = st_tx = False
-        continue
-    m = re_usage.match(line)
-    if m:
+    elif kind == "usage":
         # line shows the command name that got used
         print(line)
-        name = m.group(1)
+        name = m.group("cmd")
         if name != st_name:
             print("!!! problem with name: exp " +
                   repr(st_name) + " got " + repr(name))
             cnt_prob += 1
-        continue
-    if re_rxind.match(line):
+    elif kind == "rxind":
         # the command is receive capable (indicated by this line from usage())
         print(line)
         st_rx = True
-        continue
-    if re_txind.match(line):
+    elif kind == "txind":
         # the command in send capable (indicated by this line from usage())
         print(line)
         st_tx = True
-        continue
-    if re_abnorm.match(line):
+    elif kind == "abnorm":
         # line shows program terminated abnormally (not "normal" for this
         # test scenario)
         print("!!! problem with exit status")
         cnt_prob += 1
-        continue
-    if re_exit.match(line):
+    else:
         # line shows test completed, whether ok or not
         if st_dir <= 0 and not st_rx:
             print("!!! doesn't seem to do receive")
@@ -11,7 +11,9 @@
 #       veth interface on otn$x is otn${x}v$y; other end otn${x}v${y}be
 #       bridge interface is otnb$y
 
-# Run as root e.g. through sudo.  On Linux.
+# Run as root e.g. through sudo.  On Linux.  Needs nothing beyond Python 3
+# and iproute2's "ip" command; each phase's commands go to a few
+# "ip -batch" processes rather than a process each.
 # Beware, sometimes messing with network config like this can cause the
 # machine to lose real network connectivity.  So avoid running it on a machine
 # you're using in production, or don't have the opportunity to reset when
@@ -19,17 +21,70 @@
 
 from sys import stderr, argv, exit
 import glob
-from posix import system
+from subprocess import Popen, PIPE
 from time import sleep
 
-delay_between_commands = lambda: sleep(0.25)
-delay_between_networks = lambda: sleep(0.5)
 delay_between_phases = lambda: sleep(5.0)
 
-def emit(cmd):
-    delay_between_commands()
-    print("# "+cmd, flush= True)
-    system(cmd)
+# Commands aren't run one at a time; they're written to "ip -batch"
+# processes, saving a shell and an "ip" process per command.
+# "ip -batch" doesn't take global options like "-n" on its input lines, so
+# there's a separate process for each set of them, started when first
+# needed.  Commands given to any one process run in order.  At the end of
+# each phase, all the processes are closed and waited for, so every phase
+# can rely on all of the one before having been done; the next phase's
+# commands start new processes.
+# Within a phase, each network's own commands in the default namespace get
+# their own process, too, so the networks are set up in parallel, as are
+# the namespaces.  That's only safe because nothing in a phase depends on
+# another network's (or namespace's) commands in the same phase; anything
+# that does goes in a later phase, after the wait.
+procs = {} # (global options, network) -> "ip -batch" process
+
+def emit(cmd, net= None):
+    # 'cmd' is an argument list, starting with "ip"
+    print("# "+" ".join(cmd), flush= True)
+    args = cmd[1:] # without the "ip"
+    opts = []
+    while args[0][0] == "-":
+        n = 2 if args[0] == "-n" else 1
+        opts += args[:n]
+        del args[:n]
+    key = (tuple(opts), None if opts else net)
+    if key not in procs:
+        # "-force" so that, as before, a failing command doesn't stop the rest
+        procs[key] = Popen(["ip"] + opts + ["-force", "-batch", "-"],
+                           stdin= PIPE, text= True)
+    try:
+        procs[key].stdin.write(" ".join(args) + "\n")
+    except OSError as e:
+        batch_failed(key, e)
+
+def batch_failed(key, e):
+    # An "ip -batch" process went away early (e.g. "ip -n" couldn't enter
+    # its namespace).  Report it and drop it, so the others keep going.
+    proc = procs.pop(key)
+    msg("'" + " ".join(proc.args) + "' failed: " + str(e))
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+    proc.wait()
+
+def close_batches():
+    # waits for all the commands to have been run
+    for key, proc in list(procs.items()):
+        try:
+            proc.stdin.close()
+        except OSError as e:
+            batch_failed(key, e)
+            continue
+        proc.wait()
+    procs.clear()
+
+def end_phase():
+    close_batches()
+    delay_between_phases()
 
 def msg(str):
     print(str, flush= True, file= stderr)
@@ -42,70 +97,59 @@ nets = int(argv[2])
 
 msg("Removing any existing otn namespaces and networks")
 
-emit("ip -all netns delete")
+emit(["ip", "-all", "netns", "delete"])
+close_batches() # let the delete finish before looking for what's left
 npfx = "/proc/sys/net/ipv4/conf/"
 for dobe in (False, True):
     for netpath in glob.glob(npfx+"otn*"):
         net = netpath[len(npfx):]
         if dobe or net[-2:] != "be":
-            emit("ip link delete "+net)
+            emit(["ip", "link", "delete", net])
+    # deleting otn$xv$y takes its peer otn$xv${y}be with it; wait for that
+    # so the second pass's glob only finds what's really left
+    close_batches()
 
-delay_between_phases()
+end_phase()
 msg("Creating namespaces")
 for node in range(1, nodes + 1):
-    emit("ip netns add otn{:d}".format(node))
+    emit(["ip", "netns", "add", f"otn{node}"])
 
-delay_between_phases()
+end_phase()
 msg("Creating networks")
 for net in range(1, nets + 1):
-    emit("ip link add otnb{:d} type bridge stp_state 0".
-                format(net))
-    delay_between_networks()
-delay_between_phases()
-for net in range(1, nets + 1):
-    for node in range(1, nodes + 1):
-        emit("ip link add otn{:d}v{:d} type veth peer name otn{:d}v{:d}be".
-                    format(node, net, node, net))
-    delay_between_networks()
-delay_between_phases()
+    emit(["ip", "link", "add", f"otnb{net}", "type", "bridge",
+          "stp_state", "0"], net= net)
+end_phase()
 for net in range(1, nets + 1):
     for node in range(1, nodes + 1):
-        emit("ip link set otn{:d}v{:d} address 96:96:96:96:{:02x}:{:02x}".
-                    format(node, net, net, node))
-        emit("ip link set otn{:d}v{:d}be address 96:96:96:97:{:02x}:{:02x}".
-                    format(node, net, net, node))
-    delay_between_networks()
-delay_between_phases()
+        emit(["ip", "link", "add", f"otn{node}v{net}", "type", "veth",
+              "peer", "name", f"otn{node}v{net}be"], net= net)
+end_phase()
 for net in range(1, nets + 1):
     for node in range(1, nodes + 1):
-        emit("ip address add 10.96.{:d}.{:d}/24 dev otn{:d}v{:d}".
-                    format(net, node, node, net))
-        emit("ip address add fd96:{:x}::{:x}/64 dev otn{:d}v{:d}".
-                    format(net, node, node, net))
-    delay_between_networks()
-delay_between_phases()
+        emit(["ip", "link", "set", f"otn{node}v{net}",
+              "address", f"96:96:96:96:{net:02x}:{node:02x}"], net= net)
+        emit(["ip", "link", "set", f"otn{node}v{net}be",
+              "address", f"96:96:96:97:{net:02x}:{node:02x}"], net= net)
+end_phase()
 for net in range(1, nets + 1):
     for node in range(1, nodes + 1):
-        emit("ip link set otn{:d}v{:d} netns otn{:d}".
-                    format(node, net, node))
-        emit("ip link set otn{:d}v{:d}be master otnb{:d}".
-                    format(node, net, net))
-    delay_between_networks()
-delay_between_phases()
+        emit(["ip", "link", "set", f"otn{node}v{net}",
+              "netns", f"otn{node}"], net= net)
+        emit(["ip", "link", "set", f"otn{node}v{net}be",
+              "master", f"otnb{net}"], net= net)
+end_phase()
 for net in range(1, nets + 1):
     for node in range(1, nodes + 1):
-        emit("ip -n otn{:d} address add 10.96.{:d}.{:d}/24 dev otn{:d}v{:d}".
-                    format(node, net, node, node, net))
-        emit("ip -n otn{:d} address add fd96:{:x}::{:x}/64 dev otn{:d}v{:d}".
-                    format(node, net, node, node, net))
-    delay_between_networks()
-delay_between_phases()
+        emit(["ip", "-n", f"otn{node}", "address", "add",
+              f"10.96.{net}.{node}/24", "dev", f"otn{node}v{net}"])
+        emit(["ip", "-n", f"otn{node}", "address", "add",
+              f"fd96:{net:x}::{node:x}/64", "dev", f"otn{node}v{net}"])
+end_phase()
 for net in range(1, nets + 1):
     for node in range(1, nodes + 1):
-        emit("ip -n otn{:d} link set otn{:d}v{:d} up".
-                    format(node, node, net))
-        emit("ip link set otn{:d}v{:d}be up".
-                    format(node, net))
-    emit("ip link set otnb{:d} up".
-                format(net))
-    delay_between_networks()
+        emit(["ip", "-n", f"otn{node}", "link", "set", f"otn{node}v{net}",
+              "up"])
+        emit(["ip", "link", "set", f"otn{node}v{net}be", "up"], net= net)
+    emit(["ip", "link", "set", f"otnb{net}", "up"], net= net)
+close_batches()
@@ -27,16 +27,64 @@ nsrange = range(1, 6) # 1, 2, 3, 4, 5
 
 from sys import stderr, exit
 import glob
-from posix import system
+from subprocess import Popen, PIPE
 from time import sleep
 
-delay_between_commands = lambda: sleep(0.25)
 delay_between_phases = lambda: sleep(5.0)
 
+# Commands aren't run one at a time; they're written to "ip -batch"
+# processes, saving a shell and an "ip" process per command.
+# "ip -batch" doesn't take global options like "-n" on its input lines, so
+# there's a separate process for each set of them, started when first
+# needed.  Commands given to any one process run in order.  At the end of
+# each phase, all the processes are closed and waited for, so every phase
+# can rely on all of the one before having been done; the next phase's
+# commands start new processes.
+procs = {} # global options -> "ip -batch" process
+
 def emit(cmd):
-    delay_between_commands()
     print("# "+cmd, flush= True)
-    system(cmd)
+    args = cmd.split()[1:] # without the "ip"
+    opts = []
+    while args[0][0] == "-":
+        n = 2 if args[0] == "-n" else 1
+        opts += args[:n]
+        del args[:n]
+    opts = tuple(opts)
+    if opts not in procs:
+        # "-force" so that, as before, a failing command doesn't stop the rest
+        procs[opts] = Popen(["ip"] + list(opts) + ["-force", "-batch", "-"],
+                            stdin= PIPE, text= True)
+    try:
+        procs[opts].stdin.write(" ".join(args) + "\n")
+    except OSError as e:
+        batch_failed(opts, e)
+
+def batch_failed(key, e):
+    # An "ip -batch" process went away early (e.g. "ip -n" couldn't enter
+    # its namespace).  Report it and drop it, so the others keep going.
+    proc = procs.pop(key)
+    msg("'" + " ".join(proc.args) + "' failed: " + str(e))
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+    proc.wait()
+
+def close_batches():
+    # waits for all the commands to have been run
+    for key, proc in list(procs.items()):
+        try:
+            proc.stdin.close()
+        except OSError as e:
+            batch_failed(key, e)
+            continue
+        proc.wait()
+    procs.clear()
+
+def end_phase():
+    close_batches()
+    delay_between_phases()
 
 def msg(str):
     print(str, flush= True, file= stderr)
@@ -50,43 +98,43 @@ for n in nsrange:
 emit("ip -all netns delete") # probably already all gone
 emit("ip link delete jjb")
 
-delay_between_phases()
+end_phase()
 msg("Creating namespaces")
 for n in nsrange:
     emit("ip netns add jjn{:d}".format(n))
 
-delay_between_phases()
+end_phase()
 msg("Creating networks")
 emit("ip link add jjb type bridge stp_state 0")
 
-delay_between_phases()
+end_phase()
 for n in nsrange:
     emit("ip link add jjl{:d} type veth peer name jjp{:d}".format(n, n))
 
-delay_between_phases()
+end_phase()
 for n in nsrange:
     emit("ip link set jjl{:d} address 96:96:96:96:96:{:02x}".format(n, n))
     emit("ip link set jjp{:d} address 96:96:96:96:97:{:02x}".format(n, n))
 
-delay_between_phases()
+end_phase()
 for n in nsrange:
     emit("ip link set jjl{:d} netns jjn{:d}".format(n, n))
     emit("ip link set jjp{:d} master jjb".format(n))
 
-delay_between_phases()
+end_phase()
 for n in nsrange:
     emit("ip -n jjn{:d} address add 10.96.123.{:d}/24 dev jjl{:d}".format(n, n, n))
     emit("ip -n jjn{:d} address add fd96:abcd::{:x}/64 dev jjl{:d}".format(n, n, n))
 
-delay_between_phases()
+end_phase()
 for n in nsrange:
     emit("ip -n jjn{:d} link set jjl{:d} up".format(n, n))
     emit("ip link set jjp{:d} up".format(n))
 
-delay_between_phases()
+end_phase()
 emit("ip link set jjb address 96:96:96:96:96:fe")
 emit("ip address add 10.96.123.254/24 dev jjb")
 emit("ip address add fd96:abcd::fe/64 dev jjb")
 emit("ip link set jjb up")
 
-delay_between_phases()
+end_phase()
@@ -28,14 +28,20 @@
 
 from time import sleep
 from sys import stderr, stdin, stdout
+from os import write
 
 ws = ("", " ", "\t", "\r", "\v", "\f", "   ", "\t \t")
 
-for w1 in ws:
-    for w2 in ws:
-        cmd = w1 + "?E" + w2
-        print("Sending command: "+repr(cmd), file= stderr, flush= True)
-        print(cmd, file= stdout, flush= True)
-        sleep(0.2)
+# every combination of leading & trailing whitespace, as (message to
+# stderr, command to stdout); already encoded, to go straight to the
+# file descriptors
+cmds = [w1 + "?E" + w2 for w1 in ws for w2 in ws]
+msgs = [(("Sending command: " + repr(cmd) + "\n").encode(),
+         (cmd + "\n").encode()) for cmd in cmds]
+
+for errmsg, outmsg in msgs:
+    write(stderr.fileno(), errmsg)
+    write(stdout.fileno(), outmsg)
+    sleep(0.2)
 
 print(".x", flush=True)